@@ -0,0 +1,60 @@
+# Copyright 2023 Good Chemistry Company.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compiled kernels used to accelerate the post-processing of simulation
+results. They rely on numba, which is an optional dependency: users should
+check is_numba_installed and provide a fallback when it is False.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    is_numba_installed = True
+except ModuleNotFoundError:
+    is_numba_installed = False
+
+
+if is_numba_installed:
+
+    @njit(parallel=True, cache=True)
+    def expectation_values_from_arrays(states, probs, masks):
+        """Return the expectation values of single-term qubit-operators, given
+        basis states and their frequencies. Each sample is +1 or -1 depending
+        on the parity of the bits set in (state & mask).
+
+        Args:
+            states (array of int64): The basis states, as non-negative integers.
+            probs (array of float64): The frequencies of the basis states.
+            masks (array of int64): The masks of the terms, consistent with states.
+
+        Returns:
+            array of float64: The expectation values of the terms.
+        """
+
+        expectation_values = np.zeros(masks.size)
+        for i in range(masks.size):
+            mask = masks[i]
+            expectation_value = 0.
+            for j in prange(states.size):
+                x = states[j] & mask
+                x ^= x >> 32
+                x ^= x >> 16
+                x ^= x >> 8
+                x ^= x >> 4
+                x ^= x >> 2
+                x ^= x >> 1
+                expectation_value += (1 - 2 * (x & 1)) * probs[j]
+            expectation_values[i] = expectation_value
+        return expectation_values
@@ -32,16 +32,245 @@ contained in the static method backend_info defined by each subclass target.
 
 import abc
 import math
-from collections import Counter
+from functools import lru_cache
 
 import numpy as np
-from scipy import stats
-from bitarray import bitarray
+from openfermion.config import EQ_TOLERANCE
 
-from tangelo.linq import Gate, Circuit
+from tangelo.linq import Circuit
 from tangelo.linq.helpers.circuits.measurement_basis import measurement_basis_gates
 from tangelo.toolboxes.operators import QubitOperator
 
+# Minimum number of (basis state, term) pairs for which the numba kernel is used. Below, the numpy implementation is
+# faster than loading or compiling the kernel, which takes about 0.5 to 2 seconds per process.
+_NUMBA_MIN_SIZE = 2**22
+
+
+@lru_cache(maxsize=None)
+def _get_numba_kernel():
+    """Return the numba kernel computing expectation values from basis states
+    and masks, or None if numba is not installed. numba is only imported on the
+    first call, so that importing tangelo.linq does not pay for it.
+
+    Returns:
+        function: The kernel expectation_values_from_arrays, or None.
+    """
+
+    from tangelo.linq._kernels import is_numba_installed
+    if not is_numba_installed:
+        return None
+
+    from tangelo.linq._kernels import expectation_values_from_arrays
+    return expectation_values_from_arrays
+
+
+def _get_term_mask(term, n_qubits):
+    """Return the integer bitmask of the qubits a single-term qubit-operator
+    acts on, consistent with the integer value of lsq-first bitstrings of
+    length n_qubits (qubit 0 is the most significant bit).
+
+    Args:
+        term (tuple): a single-term qubit operator, as found in the keys of
+            QubitOperator.terms.
+        n_qubits (int): The number of qubits, i.e. the length of the bitstrings.
+
+    Returns:
+        int: The term mask.
+    """
+
+    mask = 0
+    for index, _ in term:
+        mask |= 1 << (n_qubits - 1 - index)
+    return mask
+
+
+def _get_measurement_basis(term):
+    """Return the non-diagonal part of a single-term qubit-operator, which
+    defines the basis it has to be measured in. Terms with the same measurement
+    basis can be computed from the same measurement results.
+
+    Args:
+        term (tuple): a single-term qubit operator, as found in the keys of
+            QubitOperator.terms.
+
+    Returns:
+        tuple: The (index, pauli) pairs of the term that are not I or Z.
+    """
+
+    return tuple((index, pauli) for index, pauli in term if pauli not in {"I", "Z"})
+
+
+@lru_cache(maxsize=1024)
+def _get_measurement_basis_circuit(basis, n_qubits=None):
+    """Return the circuit rotating the qubits into a measurement basis. Circuits
+    are cached, as the same bases are measured every time the expectation value
+    of an operator is computed (e.g. at each iteration of VQE). The cache is
+    bounded, so that it does not grow over long sessions with many operators.
+    The circuit returned is shared and must not be modified.
+
+    Args:
+        basis (tuple): The measurement basis, as returned by _get_measurement_basis.
+        n_qubits (int): The number of qubits of the circuit. Default, derived
+            from the qubit indices of the basis.
+
+    Returns:
+        Circuit: The basis rotation circuit.
+    """
+
+    return Circuit(measurement_basis_gates(basis), n_qubits=n_qubits)
+
+
+@lru_cache(maxsize=32)
+def _get_operator_basis_groups(terms):
+    """Sort the terms of a qubit operator by measurement basis, once for all
+    the expectation values computed for the same operator (e.g. at each
+    iteration of VQE). Terms only differing by Z operators are measured in the
+    same basis, and are grouped together.
+
+    Args:
+        terms (tuple): the (term, coefficient) items of QubitOperator.terms.
+
+    Returns:
+        complex: The coefficient of the identity term.
+        int: The largest number of qubits a term acts on.
+        tuple: The (basis, terms, coefficients) groups, with terms as a tuple
+            and coefficients as an array. Terms with zero coefficients are left out.
+    """
+
+    constant, max_term_length = 0., 0
+    basis_groups = dict()
+    for term, coef in terms:
+        max_term_length = max(max_term_length, len(term))
+        if not term:
+            constant += coef
+        elif coef != 0.:
+            group_terms, group_coefs = basis_groups.setdefault(_get_measurement_basis(term), ([], []))
+            group_terms.append(term)
+            group_coefs.append(coef)
+
+    basis_groups = tuple((basis, tuple(group_terms), np.array(group_coefs))
+                         for basis, (group_terms, group_coefs) in basis_groups.items())
+    return constant, max_term_length, basis_groups
+
+
+def _get_parity(x):
+    """Return the parity of the number of bits set in each element of an array
+    of non-negative 64-bit integers, using a vectorized popcount if available,
+    or by folding the bits onto the lowest one otherwise.
+
+    Args:
+        x (array of int64): The integers.
+
+    Returns:
+        array of int64: 0 for an even number of bits set, 1 otherwise.
+    """
+
+    # NumPy >= 2.0 exposes the hardware popcount instruction
+    if hasattr(np, "bitwise_count"):
+        return (np.bitwise_count(x) & 1).astype(np.int64)
+
+    for shift in (32, 16, 8, 4, 2, 1):
+        x = x ^ (x >> shift)
+    return x & 1
+
+
+def _get_frequency_arrays(frequencies):
+    """Parse a histogram of frequencies once into arrays of basis states
+    (integer value of the lsq-first bitstrings) and frequencies, so that
+    expectation values of any number of terms can be computed without parsing
+    the bitstrings again.
+
+    Args:
+        frequencies (dict): histogram of frequencies of measurements (assumed
+            to be in lsq-first format), with bitstrings of at most 63 bits.
+
+    Returns:
+        array of int64: The basis states.
+        array of float64: The corresponding frequencies.
+    """
+
+    states = np.fromiter((int(k, 2) for k in frequencies), dtype=np.int64, count=len(frequencies))
+    probs = np.fromiter(frequencies.values(), dtype=np.float64, count=len(frequencies))
+    return states, probs
+
+
+def _get_expectation_value_from_arrays(mask, states, probs):
+    """Return the expectation value of a single-term qubit-operator, given the
+    basis states and frequencies parsed by _get_frequency_arrays. Each sample
+    is +1 or -1 depending on the parity of the bits set in (state & mask).
+
+    Args:
+        mask (int): The term mask, as returned by _get_term_mask.
+        states (array of int64): The basis states.
+        probs (array of float64): The corresponding frequencies.
+
+    Returns:
+        float: The expectation value of the term.
+    """
+
+    # Large inputs go through the same size-gated dispatch as several terms, which may use the numba kernel
+    if states.size >= _NUMBA_MIN_SIZE:
+        return float(_get_expectation_values_from_arrays(np.array([mask], dtype=np.int64), states, probs)[0])
+
+    return float(np.dot(probs, 1 - 2 * _get_parity(states & mask)))
+
+
+def _get_expectation_values_from_frequencies(terms, frequencies):
+    """Return the expectation values of several single-term qubit-operators
+    measured in the same basis, given the result of a state-preparation. All
+    basis states are parsed once and the parities of all terms are computed
+    together with array operations.
+
+    Args:
+        terms (list of tuple): single-term qubit operators, as found in the
+            keys of QubitOperator.terms.
+        frequencies (dict): histogram of frequencies of measurements (assumed
+            to be in lsq-first format).
+
+    Returns:
+        array of float: The expectation values of the terms, in the same order.
+    """
+
+    n_qubits = len(next(iter(frequencies)))
+
+    # Bitstrings do not fit in 64-bit integers: fall back to the one-term function
+    if n_qubits > 63:
+        return np.array([get_expectation_value_from_frequencies_oneterm(term, frequencies) for term in terms])
+
+    states, probs = _get_frequency_arrays(frequencies)
+    masks = np.array([_get_term_mask(term, n_qubits) for term in terms], dtype=np.int64)
+
+    return _get_expectation_values_from_arrays(masks, states, probs)
+
+
+def _get_expectation_values_from_arrays(masks, states, probs):
+    """Return the expectation values of several single-term qubit-operators,
+    given basis states and their frequencies as arrays. Each sample is +1 or -1
+    depending on the parity of the bits set in (state & mask).
+
+    Args:
+        masks (array of int64): The term masks, consistent with states.
+        states (array of int64): The basis states.
+        probs (array of float64): The corresponding frequencies.
+
+    Returns:
+        array of float: The expectation values of the terms, in the same order.
+    """
+
+    if states.size * masks.size >= _NUMBA_MIN_SIZE:
+        numba_kernel = _get_numba_kernel()
+        if numba_kernel is not None:
+            return numba_kernel(states, probs, masks)
+
+    # Process basis states in chunks to bound the size of the (n_states, n_terms) parity matrix
+    expectation_values = np.zeros(len(masks))
+    chunk_size = max(1, 2**22 // len(masks))
+    for i in range(0, len(states), chunk_size):
+        signs = 1 - 2 * _get_parity(states[i:i+chunk_size, None] & masks[None, :])
+        expectation_values += probs[i:i+chunk_size] @ signs
+
+    return expectation_values
+
 
 def get_expectation_value_from_frequencies_oneterm(term, frequencies):
     """Return the expectation value of a single-term qubit-operator, given
@@ -59,19 +288,18 @@ def get_expectation_value_from_frequencies_oneterm(term, frequencies):
 
     if not frequencies.keys():
         return ValueError("Must pass a non-empty dictionary of frequencies.")
-    n_qubits = len(list(frequencies.keys())[0])
+    n_qubits = len(next(iter(frequencies)))
+    mask = _get_term_mask(term, n_qubits)
 
-    # Get term mask
-    mask = ["0"] * n_qubits
-    for index, op in term:
-        mask[index] = "1"
-    mask = "".join(mask)
+    # Parse all basis states at once if they fit in 64-bit integers
+    if n_qubits <= 63:
+        return _get_expectation_value_from_arrays(mask, *_get_frequency_arrays(frequencies))
 
     # Compute expectation value of the term
     expectation_term = 0.
     for basis_state, freq in frequencies.items():
-        # Compute sample value using state_binstr and term mask, update term expectation value
-        sample = (-1) ** ((bitarray(mask) & bitarray(basis_state)).to01().count("1") % 2)
+        # Compute sample value using the parity of state_binstr and term mask, update term expectation value
+        sample = 1 - 2 * (bin(int(basis_state, 2) & mask).count("1") & 1)
         expectation_term += sample * freq
 
     return expectation_term
@@ -91,20 +319,21 @@ def get_variance_from_frequencies_oneterm(term, frequencies):
 
     if not frequencies.keys():
         return ValueError("Must pass a non-empty dictionary of frequencies.")
-    n_qubits = len(list(frequencies.keys())[0])
+    n_qubits = len(next(iter(frequencies)))
+    mask = _get_term_mask(term, n_qubits)
 
-    # Get term mask
-    mask = ["0"] * n_qubits
-    for index, op in term:
-        mask[index] = "1"
-    mask = "".join(mask)
+    # Parse all basis states at once if they fit in 64-bit integers
+    if n_qubits <= 63:
+        states, probs = _get_frequency_arrays(frequencies)
+        samples = 1 - 2 * _get_parity(states & mask)
+        return float(np.dot(probs, (np.dot(probs, samples) - samples)**2))
 
     # Compute expectation value of the term
     expectation_term = get_expectation_value_from_frequencies_oneterm(term, frequencies)
     variance_term = 0.
     for basis_state, freq in frequencies.items():
-        # Compute sample variance using state_binstr and term mask, update term variance
-        sample = (-1) ** ((bitarray(mask) & bitarray(basis_state)).to01().count("1") % 2)
+        # Compute sample variance using the parity of state_binstr and term mask, update term variance
+        sample = 1 - 2 * (bin(int(basis_state, 2) & mask).count("1") & 1)
         variance_term += freq*(expectation_term - sample)**2
 
     return variance_term
@@ -157,8 +386,66 @@ def collapse_statevector_to_desired_measurement(statevector, qubit, result, orde
     return sv_selected, sqrt_probability**2
 
 
+def _get_pauli_string_masks(term, n_qubits, order="lsq_first"):
+    """Return the masks describing the action of a Pauli string on the basis
+    states of a statevector: the bits flipped (X and Y), the bits contributing
+    a sign (Y and Z), and the number of Y operators contributing a phase.
+
+    Args:
+        term (tuple): a single-term qubit operator, as found in the keys of
+            QubitOperator.terms.
+        n_qubits (int): The number of qubits of the statevector.
+        order (string): The qubit ordering of the statevector, lsq_first or msq_first.
+
+    Returns:
+        int: The mask of the bits flipped.
+        int: The mask of the bits contributing a sign.
+        int: The number of Y operators.
+    """
+
+    xor_mask, z_mask, n_y = 0, 0, 0
+    for index, pauli in term:
+        bit = 1 << (n_qubits - 1 - index if order == "lsq_first" else index)
+        if pauli in {"X", "Y"}:
+            xor_mask |= bit
+        if pauli in {"Y", "Z"}:
+            z_mask |= bit
+        n_y += (pauli == "Y")
+    return xor_mask, z_mask, n_y
+
+
+def _apply_pauli_string(statevector, term, order="lsq_first"):
+    """Return the statevector resulting from applying a Pauli string to the
+    input statevector. The action of a Pauli string only permutes the amplitudes
+    (X and Y) and multiplies them by a phase (Y and Z), no simulation needed.
+
+    Args:
+        statevector (array): The statevector the Pauli string is applied to.
+        term (tuple): a single-term qubit operator, as found in the keys of
+            QubitOperator.terms.
+        order (string): The qubit ordering of the statevector, lsq_first or msq_first.
+
+    Returns:
+        array: The resulting statevector.
+    """
+
+    n_qubits = round(math.log2(len(statevector)))
+    xor_mask, z_mask, n_y = _get_pauli_string_masks(term, n_qubits, order)
+
+    # (P|psi>)[b] = (-i)^n_y * (-1)^parity(b & z_mask) * <b ^ xor_mask|psi>, as Y = iXZ
+    basis_states = np.arange(len(statevector), dtype=np.int64)
+    signs = 1 - 2 * _get_parity(basis_states & z_mask)
+    return (-1j)**n_y * signs * np.asarray(statevector)[basis_states ^ xor_mask]
+
+
 class Backend(abc.ABC):
 
+    # Attributes common to all backends. The built-in targets declare __slots__ for their own attributes, so that their
+    # instances do not carry a __dict__. Child classes not declaring __slots__ (e.g. user-defined backends) keep a
+    # __dict__ for their own attributes, and for any additional backend_info key.
+    __slots__ = ("_current_state", "_noise_model", "n_shots", "freq_threshold", "noisy_simulation",
+                 "statevector_available", "statevector_order", "mid_circuit_meas_freqs", "all_frequencies")
+
     def __init__(self, n_shots=None, noise_model=None):
         """Instantiate Backend object.
 
@@ -335,17 +622,24 @@ class Backend(abc.ABC):
             raise ValueError(f'Statevector not supported in {self.__class__}')
 
         # Check that qubit operator does not operate on qubits beyond circuit size.
-        # Keep track if coefficients are real or not
+        # Keep track if coefficients are real or not, and if any term requires a simulation
         are_coefficients_real = True
+        requires_simulation = False
         for term, coef in qubit_operator.terms.items():
             if state_prep_circuit.width < len(term):
                 raise ValueError(f'Term {term} requires more qubits than the circuit contains ({state_prep_circuit.width})')
             if type(coef) in {complex, np.complex64, np.complex128}:
                 are_coefficients_real = False
+            if term and coef != 0.:
+                requires_simulation = True
 
         # If the underlying operator is hermitian, expectation value is real and can be computed right away
         if are_coefficients_real:
-            if self._noise_model or not self.statevector_available or self.n_shots is not None \
+            # Identity term and terms with zero coefficients: no simulation needed, unless the state preparation has to be
+            # simulated to post-select mid-circuit measurements
+            if not requires_simulation and desired_meas_result is None and not state_prep_circuit.is_mixed_state:
+                return float(qubit_operator.terms.get((), 0.))
+            elif self._noise_model or not self.statevector_available or self.n_shots is not None \
                     or (state_prep_circuit.is_mixed_state and self.n_shots is not None) or state_prep_circuit.size == 0:
                 return self._get_expectation_value_from_frequencies(qubit_operator,
                                                                     state_prep_circuit,
@@ -359,15 +653,20 @@ class Backend(abc.ABC):
 
         # Else, separate the operator into 2 hermitian operators, use linearity and call this function twice
         else:
+            # Split all coefficients at once, and drop the ones close to zero as QubitOperator.compress would
+            coefs = np.fromiter(qubit_operator.terms.values(), dtype=complex, count=len(qubit_operator.terms))
             qb_op_real, qb_op_imag = QubitOperator(), QubitOperator()
-            for term, coef in qubit_operator.terms.items():
-                qb_op_real.terms[term], qb_op_imag.terms[term] = coef.real, coef.imag
-            qb_op_real.compress()
-            qb_op_imag.compress()
-            exp_real = self.get_expectation_value(qb_op_real, state_prep_circuit, initial_statevector=initial_statevector,
-                                                  desired_meas_result=desired_meas_result)
-            exp_imag = self.get_expectation_value(qb_op_imag, state_prep_circuit, initial_statevector=initial_statevector,
-                                                  desired_meas_result=desired_meas_result)
+            qb_op_real.terms = {term: c for term, c in zip(qubit_operator.terms, coefs.real.tolist()) if abs(c) > EQ_TOLERANCE}
+            qb_op_imag.terms = {term: c for term, c in zip(qubit_operator.terms, coefs.imag.tolist()) if abs(c) > EQ_TOLERANCE}
+
+            # An empty operator has an expectation value of 0: no need to compute it
+            exp_real, exp_imag = 0., 0.
+            if qb_op_real.terms:
+                exp_real = self.get_expectation_value(qb_op_real, state_prep_circuit, initial_statevector=initial_statevector,
+                                                      desired_meas_result=desired_meas_result)
+            if qb_op_imag.terms:
+                exp_imag = self.get_expectation_value(qb_op_imag, state_prep_circuit, initial_statevector=initial_statevector,
+                                                      desired_meas_result=desired_meas_result)
             return exp_real if (exp_imag == 0.) else exp_real + 1.0j * exp_imag
 
     def get_variance(self, qubit_operator, state_prep_circuit, initial_statevector=None, desired_meas_result=None):
@@ -475,6 +774,7 @@ class Backend(abc.ABC):
             return self.expectation_value_from_prepared_state(qubit_operator, n_qubits, prepared_state)
 
         # Otherwise, use generic statevector expectation value
+        diagonal_masks, diagonal_coefs = [], []
         for term, coef in qubit_operator.terms.items():
 
             if len(term) > n_qubits:  # Cannot have a qubit index beyond circuit size
@@ -482,18 +782,26 @@ class Backend(abc.ABC):
             elif not term:  # Empty term: no simulation needed
                 expectation_value += coef
                 continue
+            elif coef == 0.:
+                continue
 
             if not self.n_shots:
-                # Directly simulate and compute expectation value using statevector
-                pauli_circuit = Circuit([Gate(pauli, index) for index, pauli in term], n_qubits=n_qubits)
-                _, pauli_state = self.simulate(pauli_circuit, return_statevector=True, initial_statevector=prepared_state)
+                # Terms only made of Z operators are diagonal: computed from the probabilities all together below
+                if not _get_measurement_basis(term):
+                    _, z_mask, _ = _get_pauli_string_masks(term, round(math.log2(len(prepared_state))), self.statevector_order)
+                    diagonal_masks.append(z_mask)
+                    diagonal_coefs.append(coef)
+                    continue
+
+                # Directly apply the Pauli string and compute expectation value using statevector
+                pauli_state = _apply_pauli_string(prepared_state, term, self.statevector_order)
 
                 delta = np.dot(pauli_state.real, prepared_state.real) + np.dot(pauli_state.imag, prepared_state.imag)
                 expectation_value += coef * delta
 
             else:
                 # Run simulation with statevector but compute expectation value with samples directly drawn from it
-                basis_circuit = Circuit(measurement_basis_gates(term), n_qubits=state_prep_circuit.width)
+                basis_circuit = _get_measurement_basis_circuit(_get_measurement_basis(term), state_prep_circuit.width)
                 if basis_circuit.size > 0:
                     frequencies, _ = self.simulate(basis_circuit, initial_statevector=prepared_state)
                 else:
@@ -501,6 +809,14 @@ class Backend(abc.ABC):
                 expectation_term = self.get_expectation_value_from_frequencies_oneterm(term, frequencies)
                 expectation_value += coef * expectation_term
 
+        # Diagonal terms: expectation values are the parity-weighted sums of the probabilities of all basis states
+        if diagonal_masks:
+            prepared_state = np.asarray(prepared_state)
+            probabilities = prepared_state.real**2 + prepared_state.imag**2
+            basis_states = np.arange(len(prepared_state), dtype=np.int64)
+            diagonal_masks = np.array(diagonal_masks, dtype=np.int64)
+            expectation_value += np.dot(diagonal_coefs, _get_expectation_values_from_arrays(diagonal_masks, basis_states, probabilities))
+
         return expectation_value
 
     def _get_expectation_value_from_frequencies(self, qubit_operator, state_prep_circuit, initial_statevector=None, desired_meas_result=None):
@@ -519,7 +835,8 @@ class Backend(abc.ABC):
                 state preparation.
         """
         n_qubits = state_prep_circuit.width
-        if not self.statevector_available or state_prep_circuit.is_mixed_state or self._noise_model:
+        pure_state = self.statevector_available and not state_prep_circuit.is_mixed_state and not self._noise_model
+        if not pure_state:
             initial_circuit = state_prep_circuit
             if initial_statevector is not None and not self.statevector_available:
                 raise ValueError(f'Backend {self.__class__} does not support statevectors')
@@ -532,22 +849,42 @@ class Backend(abc.ABC):
                                                    initial_statevector=initial_statevector,
                                                    desired_meas_result=desired_meas_result)
 
-        expectation_value = 0.
-        for term, coef in qubit_operator.terms.items():
+        # Empty term: no simulation needed. Terms are grouped by measurement basis, once per operator
+        expectation_value, max_term_length, basis_groups = _get_operator_basis_groups(tuple(qubit_operator.terms.items()))
+        if max_term_length > n_qubits:
+            raise ValueError(f"Size of operator {qubit_operator} beyond circuit width ({n_qubits} qubits)")
 
-            if len(term) > n_qubits:
-                raise ValueError(f"Size of operator {qubit_operator} beyond circuit width ({n_qubits} qubits)")
-            elif not term:  # Empty term: no simulation needed
-                expectation_value += coef
+        for basis, group_terms, group_coefs in basis_groups:
+            basis_circuit = _get_measurement_basis_circuit(basis)
+            full_circuit = initial_circuit + basis_circuit if (basis_circuit.size > 0) else initial_circuit
+
+            # Noisy or mixed-state simulation: the shots of each term come from their own simulation
+            if not pure_state:
+                for term, coef in zip(group_terms, group_coefs):
+                    frequencies, _ = self.simulate(full_circuit,
+                                                   initial_statevector=updated_statevector,
+                                                   desired_meas_result=desired_meas_result)
+                    expectation_value += coef * self.get_expectation_value_from_frequencies_oneterm(term, frequencies)
                 continue
 
-            basis_circuit = Circuit(measurement_basis_gates(term))
-            full_circuit = initial_circuit + basis_circuit if (basis_circuit.size > 0) else initial_circuit
-            frequencies, _ = self.simulate(full_circuit,
-                                           initial_statevector=updated_statevector,
-                                           desired_meas_result=desired_meas_result)
-            expectation_term = self.get_expectation_value_from_frequencies_oneterm(term, frequencies)
-            expectation_value += coef * expectation_term
+            # Pure state: rotate the statevector in the measurement basis once for all terms of the group
+            frequencies, basis_statevector = self.simulate(full_circuit,
+                                                           return_statevector=True,
+                                                           initial_statevector=updated_statevector,
+                                                           desired_meas_result=desired_meas_result)
+            if not self.n_shots:
+                expectation_value += np.dot(group_coefs, _get_expectation_values_from_frequencies(group_terms, frequencies))
+            else:
+                # Draw independent shots for each term, as if they were measured separately. Backends not returning the
+                # statevector when shots are requested simulate the circuit again for each term
+                for i, (term, coef) in enumerate(zip(group_terms, group_coefs)):
+                    if i > 0 and basis_statevector is None:
+                        frequencies, _ = self.simulate(full_circuit,
+                                                       initial_statevector=updated_statevector,
+                                                       desired_meas_result=desired_meas_result)
+                    elif i > 0:
+                        frequencies = self._statevector_to_frequencies(basis_statevector)
+                    expectation_value += coef * self.get_expectation_value_from_frequencies_oneterm(term, frequencies)
 
         return expectation_value
 
@@ -581,21 +918,23 @@ class Backend(abc.ABC):
                                                    initial_statevector=initial_statevector,
                                                    desired_meas_result=desired_meas_result)
 
+        # Empty term and terms with zero coefficients: no variance
         variance = 0.
-        for term, coef in qubit_operator.terms.items():
+        _, max_term_length, basis_groups = _get_operator_basis_groups(tuple(qubit_operator.terms.items()))
+        if max_term_length > n_qubits:
+            raise ValueError(f"Size of operator {qubit_operator} beyond circuit width ({n_qubits} qubits)")
 
-            if len(term) > n_qubits:
-                raise ValueError(f"Size of operator {qubit_operator} beyond circuit width ({n_qubits} qubits)")
-            elif not term:  # Empty term: no simulation needed
-                pass
-
-            basis_circuit = Circuit(measurement_basis_gates(term))
+        for basis, group_terms, group_coefs in basis_groups:
+            basis_circuit = _get_measurement_basis_circuit(basis)
             full_circuit = initial_circuit + basis_circuit if (basis_circuit.size > 0) else initial_circuit
             frequencies, _ = self.simulate(full_circuit, initial_statevector=updated_statevector)
-            variance_term = self.get_variance_from_frequencies_oneterm(term, frequencies)
+
+            # Samples are +1 or -1: sum_k f_k (E - s_k)^2 only depends on the expectation value E and sum_k f_k
+            expectation_terms = _get_expectation_values_from_frequencies(group_terms, frequencies)
+            variance_terms = sum(frequencies.values()) * (1 + expectation_terms**2) - 2 * expectation_terms**2
             # Assumes no correlation between terms
             # https://en.wikipedia.org/wiki/Propagation_of_uncertainty#Example_formulae
-            variance += coef * coef * variance_term
+            variance += np.dot(np.square(group_coefs), variance_terms)
 
         return variance
 
@@ -653,35 +992,39 @@ class Backend(abc.ABC):
         """
 
         n_qubits = int(math.log2(len(statevector)))
-        frequencies = dict()
-        for i, amplitude in enumerate(statevector):
-            frequency = abs(amplitude)**2
-            if (frequency - self.freq_threshold) >= 0.:
-                frequencies[self._int_to_binstr(i, n_qubits)] = frequency
+        indices, probabilities = self._statevector_to_probabilities(statevector)
 
         # If n_shots, has been specified, then draw that amount of samples from the distribution
         # and return empirical frequencies instead. Otherwise, return the exact frequencies
         if not self.n_shots:
-            return frequencies
+            return dict(zip(self._ints_to_binstrs(indices, n_qubits), probabilities.tolist()))
         else:
-            xk, pk = [], []
-            for k, v in frequencies.items():
-                xk.append(int(k[::-1], 2))
-                pk.append(frequencies[k])
-            distr = stats.rv_discrete(name='distr', values=(np.array(xk), np.array(pk)))
-
-            # Generate samples from distribution. Cut in chunks to ensure samples fit in memory, gradually accumulate
-            chunk_size = 10**7
-            n_chunks = self.n_shots // chunk_size
-            freqs_shots = Counter()
-
-            for i in range(n_chunks+1):
-                this_chunk = self.n_shots % chunk_size if i == n_chunks else chunk_size
-                samples = distr.rvs(size=this_chunk)
-                freqs_shots += Counter(samples)
-            freqs_shots = {self._int_to_binstr(k, n_qubits, False): v / self.n_shots for k, v in freqs_shots.items()}
+            # Draw the number of occurrences of each basis state in a single call, no individual samples needed
+            counts = np.random.multinomial(self.n_shots, probabilities / probabilities.sum())
+            sampled = np.nonzero(counts)[0]
+            freqs_shots = dict(zip(self._ints_to_binstrs(indices[sampled], n_qubits),
+                                   (counts[sampled] / self.n_shots).tolist()))
             return freqs_shots
 
+    def _statevector_to_probabilities(self, statevector):
+        """Compute the probabilities of all basis states at once, and only keep
+        the ones above the frequency threshold.
+
+        Args:
+            statevector (list or ndarray(complex)): an iterable 1D data-structure
+                containing the amplitudes.
+
+        Returns:
+            array of int: The indices of the basis states kept, in the ordering
+                of the statevector.
+            array of float: The corresponding probabilities.
+        """
+
+        statevector = np.asarray(statevector)
+        probabilities = statevector.real**2 + statevector.imag**2
+        indices = np.nonzero(probabilities >= self.freq_threshold)[0]
+        return indices, probabilities[indices]
+
     def _int_to_binstr(self, i, n_qubits, use_ordering=True):
         """Convert an integer into a bit string of size n_qubits.
 
@@ -699,6 +1042,31 @@ class Backend(abc.ABC):
 
         return state_binstr if use_ordering and (self.statevector_order == "lsq_first") else state_binstr[::-1]
 
+    def _ints_to_binstrs(self, indices, n_qubits, use_ordering=True):
+        """Convert an array of integers into bit strings of size n_qubits, all
+        at once. Equivalent to calling _int_to_binstr on each integer.
+
+        Args:
+            indices (array of int): integers to convert to bit strings.
+            n_qubits (int): The number of qubits and length of returned bit strings.
+            use_ordering (bool): Flip the order of the returned bit strings
+                depending on self.statevector_order being "msq_first" or "lsq_first"
+
+        Returns:
+            list of string: The bit strings of the integers in lsq-first order.
+        """
+        if n_qubits == 0:
+            return [""] * len(indices)
+
+        # Bit of each integer to write at each position of the bit string, as ASCII "0" or "1"
+        if use_ordering and (self.statevector_order == "lsq_first"):
+            shifts = np.arange(n_qubits-1, -1, -1)
+        else:
+            shifts = np.arange(n_qubits)
+        bits = ((np.asarray(indices, dtype=np.int64)[:, None] >> shifts) & 1).astype(np.uint8) + ord("0")
+
+        return bits.view(f"S{n_qubits}").ravel().astype(str).tolist()
+
     def collapse_statevector_to_desired_measurement(self, statevector, qubit, result, ignore_zero_prob=False):
         """Take 0 or 1 part of a statevector for a given qubit and return a normalized statevector and probability.
 
@@ -713,7 +1081,7 @@ class Backend(abc.ABC):
             float: the probability this occurred.
         """
 
-        return collapse_statevector_to_desired_measurement(statevector, qubit, result, self.backend_info()['statevector_order'], ignore_zero_prob)
+        return collapse_statevector_to_desired_measurement(statevector, qubit, result, self.statevector_order, ignore_zero_prob)
 
     def perform_measurement(self, statevector, qubit, desired_meas_result=None):
         """Perform a measurement and return the new statevector and the probability that measurement occurred
@@ -24,6 +24,8 @@ from tangelo.linq.translator import translate_operator
 
 class CirqSimulator(Backend):
 
+    __slots__ = ("cirq",)
+
     def __init__(self, n_shots=None, noise_model=None):
         """Instantiate cirq simulator object.
 
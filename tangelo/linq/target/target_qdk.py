@@ -21,6 +21,8 @@ from tangelo.linq.translator import translate_circuit as translate_c
 
 class QDKSimulator(Backend):
 
+    __slots__ = ("qsharp",)
+
     def __init__(self, n_shots=None, noise_model=None):
         import qsharp
         super().__init__(n_shots=n_shots, noise_model=noise_model)
@@ -25,6 +25,8 @@ from tangelo.linq.noisy_simulation.noise_models import get_qiskit_noise_model
 class QiskitSimulator(Backend):
     """Interface to the qiskit simulator."""
 
+    __slots__ = ("qiskit", "AerSimulator")
+
     def __init__(self, n_shots=None, noise_model=None):
         import qiskit
         from qiskit_aer import AerSimulator
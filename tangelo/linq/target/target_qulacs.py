@@ -26,6 +26,8 @@ from tangelo.linq.translator import translate_operator
 
 class QulacsSimulator(Backend):
 
+    __slots__ = ("qulacs",)
+
     def __init__(self, n_shots=None, noise_model=None):
         import qulacs
         super().__init__(n_shots=n_shots, noise_model=noise_model)
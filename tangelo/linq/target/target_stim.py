@@ -29,6 +29,9 @@ from tangelo.linq.helpers.circuits.measurement_basis import pauli_of_to_string,
 
 class StimSimulator(Backend):
     """Interface to the stim simulator"""
+
+    __slots__ = ("stim",)
+
     def __init__(self, n_shots=None, noise_model=None):
         import stim
         super().__init__(n_shots=n_shots, noise_model=noise_model)
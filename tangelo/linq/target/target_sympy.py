@@ -22,6 +22,8 @@ from tangelo.linq.translator import translate_operator
 
 class SympySimulator(Backend):
 
+    __slots__ = ()
+
     def __init__(self, n_shots=None, noise_model=None):
         super().__init__(n_shots, noise_model)
 
@@ -18,7 +18,10 @@
 """
 
 import unittest
+from unittest.mock import patch
 import os
+import subprocess
+import sys
 import time
 from typing import List
 
@@ -29,12 +32,20 @@ from tangelo.toolboxes.operators import QubitOperator
 from tangelo.linq import Gate, Circuit, get_backend, ClassicalControl
 from tangelo.linq.translator import translate_circuit as translate_c
 from tangelo.linq.gate import PARAMETERIZED_GATES
-from tangelo.linq.target.backend import Backend, get_expectation_value_from_frequencies_oneterm
+from tangelo.linq.target.backend import (Backend, get_expectation_value_from_frequencies_oneterm,
+                                         _get_expectation_values_from_frequencies, _apply_pauli_string,
+                                         _get_measurement_basis_circuit, _get_operator_basis_groups, _get_parity,
+                                         _get_term_mask, _get_numba_kernel)
+from tangelo.linq._kernels import is_numba_installed
 from tangelo.helpers.utils import (installed_simulator, installed_sv_simulator, installed_backends,
                                    installed_clifford_simulators, assert_freq_dict_almost_equal,
                                    installed_cmeasure_simulators)
 
 
+if is_numba_installed:
+    from tangelo.linq._kernels import expectation_values_from_arrays
+
+
 path_data = os.path.dirname(os.path.abspath(__file__)) + '/data'
 
 # Simple circuit for superposition, also tells us qubit ordering as well immediately from the statevector
@@ -538,6 +549,47 @@ class TestSimulateStatevector(unittest.TestCase):
             exp_c = simulator.get_expectation_value(op_c, circuit3)
             assert (type(exp_c) in {float, np.float64} and exp_c == exp_r1)
 
+    def test_get_exp_value_identity_only(self):
+        """ Operators with only identity or zero-coefficient terms do not require a simulation, unless mid-circuit
+        measurements must be post-selected """
+
+        op = QubitOperator("", 2) + QubitOperator("Z0", 0.)
+        mixed_circuit = Circuit([Gate("H", 0), Gate("MEASURE", 0), Gate("X", 1)])
+
+        for b in installed_sv_simulator:
+            simulator = get_backend(target=b)
+            with patch.object(Backend, "simulate") as mock_simulate:
+                exp_value = simulator.get_expectation_value(op, circuit3)
+            mock_simulate.assert_not_called()
+            self.assertEqual(exp_value, 2.)
+            self.assertIsInstance(exp_value, float)
+
+        simulator = get_backend(target="cirq")
+        exp_value = simulator.get_expectation_value(QubitOperator("", 2), mixed_circuit, desired_meas_result="0")
+        self.assertEqual(exp_value, 2.)
+        self.assertIsInstance(exp_value, float)
+        self.assertAlmostEqual(mixed_circuit.success_probabilities["0"], 0.5, delta=1.e-8)
+        self.assertRaises(ValueError, simulator.get_expectation_value, QubitOperator("", 2), mixed_circuit,
+                          desired_meas_result="01")
+
+    def test_get_exp_value_complex_empty_imaginary_part(self):
+        """ With complex coefficients of null imaginary part, only the real part of the operator is computed """
+
+        for b in installed_sv_simulator:
+            simulator = get_backend(target=b)
+            get_expectation_value = Backend.get_expectation_value
+            operators = []
+
+            def recording_get_expectation_value(self, qubit_operator, *args, **kwargs):
+                operators.append(qubit_operator)
+                return get_expectation_value(self, qubit_operator, *args, **kwargs)
+
+            with patch.object(Backend, "get_expectation_value", recording_get_expectation_value):
+                exp_value = simulator.get_expectation_value(op1 + 0.j * op1, circuit3)
+            self.assertEqual(len(operators), 2)
+            self.assertEqual(operators[1], op1)
+            self.assertAlmostEqual(exp_value, simulator.get_expectation_value(op1, circuit3), delta=1.e-12)
+
     def test_get_exp_value_from_frequencies(self):
         """ Test the method computing the expectation value from frequencies, with a given simulator """
 
@@ -597,6 +649,110 @@ class TestSimulateMisc(unittest.TestCase):
         exp_value = coef * get_expectation_value_from_frequencies_oneterm(term, ref_freqs[2])
         np.testing.assert_almost_equal(exp_value, -0.41614684, decimal=5)
 
+    def test_get_exp_values_from_frequencies_several_terms(self):
+        """ Test the vectorized computation of the expectation values of several terms sharing the same frequencies,
+        against the one-term function. """
+
+        terms = [((0, 'Z'),), ((1, 'Z'),), ((0, 'Z'), (1, 'Z')), ((0, 'Z'), (1, 'Z'), (2, 'Z'))]
+        exp_values = _get_expectation_values_from_frequencies(terms, ref_freqs[4])
+        ref_values = [get_expectation_value_from_frequencies_oneterm(term, ref_freqs[4]) for term in terms]
+        np.testing.assert_almost_equal(exp_values, ref_values, decimal=8)
+
+    def test_get_parity(self):
+        """ Test the vectorized parity of the number of bits set against Python integers. """
+
+        x = np.array([0, 1, 3, 7, 2**40 + 5, 2**62 + 2**33 + 1, 2**63 - 1], dtype=np.int64)
+        np.testing.assert_array_equal(_get_parity(x), [bin(v).count("1") % 2 for v in x.tolist()])
+
+    @unittest.skipIf(not is_numba_installed, "Test Skipped: numba not available \n")
+    def test_expectation_values_numba_kernel(self):
+        """ Test the numba kernel computing expectation values from basis states and masks, against the one-term
+        function. """
+
+        terms = [((0, 'Z'),), ((1, 'Z'),), ((0, 'Z'), (1, 'Z')), ((0, 'Z'), (1, 'Z'), (2, 'Z'))]
+        states = np.array([int(k, 2) for k in ref_freqs[4]], dtype=np.int64)
+        probs = np.array(list(ref_freqs[4].values()), dtype=np.float64)
+        masks = np.array([_get_term_mask(term, 3) for term in terms], dtype=np.int64)
+        exp_values = expectation_values_from_arrays(states, probs, masks)
+        ref_values = [get_expectation_value_from_frequencies_oneterm(term, ref_freqs[4]) for term in terms]
+        np.testing.assert_almost_equal(exp_values, ref_values, decimal=8)
+
+    @unittest.skipIf(not is_numba_installed, "Test Skipped: numba not available \n")
+    def test_expectation_values_numba_dispatch(self):
+        """ Test that the numba kernel is only used above the size threshold, for one and several terms. """
+
+        terms = [((0, 'Z'),), ((0, 'Z'), (1, 'Z'), (2, 'Z'))]
+        ref_values = [get_expectation_value_from_frequencies_oneterm(term, ref_freqs[4]) for term in terms]
+
+        with patch("tangelo.linq.target.backend._get_numba_kernel", wraps=_get_numba_kernel) as mock_get_kernel:
+            _get_expectation_values_from_frequencies(terms, ref_freqs[4])
+            mock_get_kernel.assert_not_called()
+
+            with patch("tangelo.linq.target.backend._NUMBA_MIN_SIZE", 1):
+                exp_values = _get_expectation_values_from_frequencies(terms, ref_freqs[4])
+                exp_value = get_expectation_value_from_frequencies_oneterm(terms[1], ref_freqs[4])
+            self.assertEqual(mock_get_kernel.call_count, 2)
+
+        np.testing.assert_almost_equal(exp_values, ref_values, decimal=8)
+        self.assertAlmostEqual(exp_value, ref_values[1], delta=1.e-8)
+
+    def test_numba_not_imported_with_linq(self):
+        """ Test that importing tangelo.linq does not import numba, which is only loaded for large inputs. """
+
+        code = "import sys, tangelo.linq; sys.exit('numba' in sys.modules)"
+        self.assertEqual(subprocess.run([sys.executable, "-c", code]).returncode, 0)
+
+    def test_ints_to_binstrs(self):
+        """ Test the vectorized conversion of integers to bit strings against _int_to_binstr, for both orderings. """
+
+        indices = np.array([0, 1, 5, 6, 12, 15])
+        for target in ["qulacs", "cirq"]:
+            if target not in installed_backends:
+                continue
+            sim = get_backend(target=target)
+            for use_ordering in [True, False]:
+                ref_strs = [sim._int_to_binstr(i, 4, use_ordering) for i in indices.tolist()]
+                self.assertEqual(sim._ints_to_binstrs(indices, 4, use_ordering), ref_strs)
+
+    def test_apply_pauli_string(self):
+        """ Test the action of a Pauli string on a statevector against the explicit Kronecker product of Pauli
+        matrices, for both qubit orderings. """
+
+        paulis = {"I": np.eye(2), "X": np.array([[0, 1], [1, 0]]), "Y": np.array([[0, -1j], [1j, 0]]),
+                  "Z": np.array([[1, 0], [0, -1]])}
+        term = ((0, "Y"), (1, "X"), (3, "Z"))
+        labels = ["I"] * 4
+        for index, pauli in term:
+            labels[index] = pauli
+
+        state = np.random.rand(16) + 1j * np.random.rand(16)
+        for order, ordered_labels in [("lsq_first", labels), ("msq_first", labels[::-1])]:
+            matrix = np.array([[1.]])
+            for label in ordered_labels:
+                matrix = np.kron(matrix, paulis[label])
+            np.testing.assert_array_almost_equal(_apply_pauli_string(state, term, order), matrix @ state)
+
+    def test_measurement_basis_circuit_cached(self):
+        """ Test that the measurement basis circuits are built once and reused. """
+
+        basis = ((0, "X"), (2, "Y"))
+        basis_circuit = _get_measurement_basis_circuit(basis, 3)
+        self.assertIs(_get_measurement_basis_circuit(basis, 3), basis_circuit)
+        self.assertEqual(basis_circuit, Circuit([Gate("RY", 0, parameter=-np.pi/2), Gate("RX", 2, parameter=np.pi/2)],
+                                                n_qubits=3))
+
+    def test_operator_basis_groups(self):
+        """ Test the grouping of the terms of an operator by measurement basis. """
+
+        qubit_op = 2. + QubitOperator("Z0") + 0.5 * QubitOperator("X0 Z1") - QubitOperator("X0") + 0. * QubitOperator("Y2")
+        constant, max_term_length, basis_groups = _get_operator_basis_groups(tuple(qubit_op.terms.items()))
+
+        self.assertEqual(constant, 2.)
+        self.assertEqual(max_term_length, 2)
+        self.assertEqual([(basis, terms) for basis, terms, _ in basis_groups],
+                         [((), (((0, "Z"),),)), (((0, "X"),), (((0, "X"), (1, "Z")), ((0, "X"),)))])
+        np.testing.assert_array_equal(basis_groups[1][2], [0.5, -1.])
+
     def test_invalid_target(self):
         """ Ensure an error is returned if the target simulator is not supported."""
         self.assertRaises(ValueError, get_backend, 'banana')
@@ -639,6 +795,37 @@ class TestSimulateMisc(unittest.TestCase):
         np.testing.assert_almost_equal(np.array([0., 0., 0., 1.]), sv)
         self.assertAlmostEqual(sim.get_expectation_value(QubitOperator("Z0", 1.), circuit1), -1.)
 
+    def test_backend_slots(self):
+        """ Test that instances of the built-in targets do not carry a __dict__, as all their attributes are declared in
+        __slots__. """
+
+        for b in installed_backends:
+            sim = get_backend(target=b, n_shots=10)
+            self.assertFalse(hasattr(sim, "__dict__"), msg=f"{b} target")
+            with self.assertRaises(AttributeError):
+                sim.undeclared_attribute = None
+
+    def test_user_provided_simulator_without_statevector_with_shots(self):
+        """Test expectation values with shots for a user defined target simulator that does not return the statevector
+        when shots are requested. Terms measured in the same basis are simulated separately."""
+
+        class ZerosSimulator(Backend):
+
+            def simulate_circuit(self, source_circuit: Circuit, return_statevector=False, initial_statevector=None):
+                """Return the all zeros state, without statevector."""
+                return {"0" * source_circuit.width: 1.}, None
+
+            @staticmethod
+            def backend_info():
+                return {"statevector_available": True, "statevector_order": "msq_first", "noisy_simulation": False}
+
+        sim = get_backend(ZerosSimulator, n_shots=10, noise_model=None)
+        qubit_op = QubitOperator("X0", 1.) + QubitOperator("X0 Z1", 0.5)
+        with patch.object(ZerosSimulator, "simulate_circuit", wraps=sim.simulate_circuit) as mock_simulate_circuit:
+            self.assertAlmostEqual(sim.get_expectation_value(qubit_op, circuit1), 1.5)
+        # One simulation of the state preparation, and one per term of the X0 measurement basis
+        self.assertEqual(mock_simulate_circuit.call_count, 3)
+
     def test_measurement_controlled_gates_using_dictionary(self):
         """Test CMEASURE gate when parameter is a dictionary of operations with keys of "1" and "0"."""
 
@@ -20,6 +20,8 @@ Ref:
 """
 
 import math
+import warnings
+from functools import lru_cache
 from typing import Union, List, Tuple
 
 import numpy as np
@@ -29,69 +31,111 @@ from tangelo.toolboxes.operators import QubitOperator
 from tangelo.linq.helpers.circuits.statevector import StateVector
 from tangelo.toolboxes.circuits.lcu import get_uprep_uselect, sign_flip, get_lcu_qubit_op_info
 
+_PI_2 = np.pi/2
+_PI_4 = np.pi/4
+_TWO_PI = 2*np.pi
 
-def ham_sim_phases(tau: float, eps: float = 1.e-2, n_attempts: int = 10, method: str = "laurent") -> Tuple[List[float], List[float]]:
-    """Generate the phases required for QSP time-evolution using the pyqsp package
+# Want 1-norm of coefficents to sum to 1/np.sin(np.pi/(2*(2*3+1))) so three oblivious amplitude amplifications results
+# in success probability of 1. |(cos(Ht)|=2 and |iSin(Ht))|=2 so need to add (tsum-4)/2 I - (tsum-4)/2 I.
+_TARSUM = 1/np.sin(np.pi/(2*(2*3+1)))
+_LCU_STATE_COEFFS = np.sqrt(np.array([(_TARSUM-4)/2, (_TARSUM-4)/2, 2, 2]))/np.sqrt(_TARSUM)
+
+
+def ham_sim_phases(tau: float, eps: float = 1.e-2, n_attempts: int = 10, method: str = "laurent",
+                   max_eps: float = None) -> Tuple[List[float], List[float]]:
+    """Generate the phases required for QSP time-evolution using the pyqsp package.
+    Phases are cached: calling this function again with the same arguments does not recompute them.
 
     Args:
         tau (float): The evolution time.
         eps (float): The precision to calculate the factors. Higher precision is more likely to fail.
         n_attempts (int): The number of attempts to calculate the phase factors. Often multiple tries are required.
         method: "laurent": Laurent Polynomial method (unstable but fast). "tf" requires TensorFlow installed and is stable but very slow.
+        max_eps (float): The largest precision the phase factors calculation can be relaxed to. After each failed attempt,
+            the precision is multiplied by 1.5, up to max_eps, and a warning is issued. Default, eps (no relaxation).
 
     Returns:
         List[float]: The phases for Cos(Ht).
         List[float]: The phases for i*Sin(Ht).
     """
-    try:
-        import pyqsp
-    except ModuleNotFoundError:
-        raise ModuleNotFoundError("pyqsp package is required to calculate QSP time-evolution phases using 'laurent' or 'tf' method.")
+    if max_eps is None:
+        max_eps = eps
+    elif max_eps < eps:
+        raise ValueError(f"max_eps ({max_eps}) must be greater than or equal to eps ({eps}).")
+
+    phiset, phiset2 = _ham_sim_phases(tau, eps, n_attempts, method, max_eps)
+    return list(phiset), list(phiset2)
+
+
+@lru_cache(maxsize=256)
+def _ham_sim_phases(tau: float, eps: float, n_attempts: int, method: str, max_eps: float) -> Tuple[Tuple[float], Tuple[float]]:
+    """Cached implementation of ham_sim_phases, returning the phases as tuples so that they cannot be modified."""
+    pg_cos, pg_sin = _get_pyqsp_poly_generators()
+
+    # Compute phases for real part Cos(Ht) and imaginary part i*Sin(Ht) of Exp(iHt)
+    phiset = _solve_one_phase_set(pg_cos, tau, eps, n_attempts, method, "real", max_eps)
+    phiset2 = _solve_one_phase_set(pg_sin, tau, eps, n_attempts, method, "imaginary", max_eps)
+    return phiset, phiset2
+
+
+def _solve_one_phase_set(poly_generator, tau: float, eps: float, n_attempts: int, method: str, part: str,
+                         max_eps: float) -> Tuple[float]:
+    """Generate the polynomial approximation of one part of Exp(iHt) and compute its QSP phases, with retries.
+
+    Args:
+        poly_generator: The pyqsp polynomial generator of the part (PolyCosineTX or PolySineTX).
+        tau (float): The evolution time.
+        eps (float): The precision to calculate the factors.
+        n_attempts (int): The number of attempts to calculate the phase factors.
+        method (str): The pyqsp method used to calculate the phase factors.
+        part (str): "real" or "imaginary", used in the messages.
+        max_eps (float): The largest precision the calculation of the phase factors can be relaxed to.
 
+    Returns:
+        Tuple[float]: The phases of the part.
+    """
     from pyqsp import angle_sequence
     from pyqsp.angle_sequence import AngleFindingError
     from pyqsp.completion import CompletionError
 
-    # Compute phases for real part Cos(Ht) of Exp(iHt)
-    pg = pyqsp.poly.PolyCosineTX()
-    pcoefs, _ = pg.generate(tau=tau,
-                            return_coef=True,
-                            ensure_bounded=True,
-                            return_scale=True, epsilon=eps)
+    pcoefs, _ = poly_generator.generate(tau=tau,
+                                        return_coef=True,
+                                        ensure_bounded=True,
+                                        return_scale=True, epsilon=eps)
+    eps_attempt = eps
     for i in range(n_attempts):
         try:
             phiset = angle_sequence.QuantumSignalProcessingPhases(
-                pcoefs, eps=eps, suc=1-eps/10, method=method)
+                pcoefs, eps=eps_attempt, suc=1-eps_attempt/10, method=method)
         except (AngleFindingError, CompletionError):
             if i == n_attempts-1:
-                raise RuntimeError("Real phases calculation failed, increase n_attempts or eps")
+                raise RuntimeError(f"{part.capitalize()} phases calculation failed, increase n_attempts or eps")
             else:
-                print(f"Attempt {i+2} for the real coefficients")
+                # Relax the precision of the next attempt, up to the precision allowed by the user
+                if eps_attempt < max_eps:
+                    eps_attempt = min(1.5*eps_attempt, max_eps)
+                    warnings.warn(f"Relaxing the precision of the {part} phases to eps={eps_attempt:.2e}", RuntimeWarning)
+                print(f"Attempt {i+2} for the {part} phases")
         else:
             break
+    return tuple(phiset)
 
-    # Compute phases for imaginary part i*Sin(Ht) of Exp(iHt)
-    pg = pyqsp.poly.PolySineTX()
-    pcoefs, _ = pg.generate(tau=tau,
-                            return_coef=True,
-                            ensure_bounded=True,
-                            return_scale=True, epsilon=eps)
-    for i in range(n_attempts):
-        try:
-            phiset2 = angle_sequence.QuantumSignalProcessingPhases(
-                pcoefs, eps=eps, suc=1-eps/10, method=method)
-        except (AngleFindingError, CompletionError):
-            if i == n_attempts-1:
-                raise RuntimeError("Imaginary phases calculation failed, increase n_attempts or eps")
-            else:
-                print(f"Attempt {i+2} for the imaginary phases")
-        else:
-            break
-    return phiset, phiset2
+
+@lru_cache(maxsize=None)
+def _get_pyqsp_poly_generators():
+    """Return the pyqsp generators of the polynomials approximating Cos(Ht) and Sin(Ht). They do not hold any state,
+    and are only created once."""
+    try:
+        import pyqsp.poly
+    except ModuleNotFoundError:
+        raise ModuleNotFoundError("pyqsp package is required to calculate QSP time-evolution phases using 'laurent' or 'tf' method.")
+
+    return pyqsp.poly.PolyCosineTX(), pyqsp.poly.PolySineTX()
 
 
 def ham_sim_phases_QSPPACK(folder: str, tau: float, eps: float = 1.e-7) -> Tuple[List[float], List[float]]:
     """Generate the phases required for QSP time-evolution using the QSPPACK package.
+    Phases are cached: calling this function again with the same arguments does not recompute them.
 
     QSPPACK is an Matlab/Octave based package that calculates the phase factors. To run this function, a user needs to have:
     1) Octave installed and accessible in path. Octave can be found at https://octave.org/
@@ -107,8 +151,15 @@ def ham_sim_phases_QSPPACK(folder: str, tau: float, eps: float = 1.e-7) -> Tuple
         List[float]: The phases for Cos(Ht).
         List[float]: The phases for i*Sin(Ht).
     """
+    phi1, phi2 = _ham_sim_phases_QSPPACK(folder, tau, eps)
+    return list(phi1), list(phi2)
+
+
+@lru_cache(maxsize=256)
+def _ham_sim_phases_QSPPACK(folder: str, tau: float, eps: float) -> Tuple[Tuple[float], Tuple[float]]:
+    """Cached implementation of ham_sim_phases_QSPPACK, returning the phases as tuples so that they cannot be modified."""
     from oct2py import octave
-    from scipy.special import jn
+    from scipy.special import jv
 
     octave.addpath(folder)
     opts = octave.struct("criteria", eps)
@@ -116,18 +167,19 @@ def ham_sim_phases_QSPPACK(folder: str, tau: float, eps: float = 1.e-7) -> Tuple
     if maxorder % 2 == 1:
         maxorder -= 1
 
-    coef = np.zeros((maxorder//2 + 1, 1), dtype=float, order='F')
-    for i in range(1, len(coef)+1):
-        coef[i-1][0] = (-1)**(i-1)*jn(2*(i-1), tau)
+    # Chebyshev coefficients (-1)^k J_2k(tau) of Cos(Ht) and (-1)^k J_2k+1(tau) of Sin(Ht), from a single evaluation of
+    # the Bessel functions of all orders 0 to maxorder+1
+    bessel = jv(np.arange(maxorder+2), tau)
+    k = np.arange(maxorder//2 + 1)
+    signs = 1. - 2.*(k & 1)
+    coef = np.asfortranarray((signs * bessel[0::2]).reshape(-1, 1))
     coef[0] = coef[0]/2
     phi1, _ = octave.QSP_solver(coef, 0, opts, nout=2)
 
-    coef = np.zeros((maxorder//2+1, 1), dtype=float, order='F')
-    for i in range(1, len(coef)+1):
-        coef[i-1][0] = (-1)**(i-1)*jn(2*i-1, tau)
+    coef = np.asfortranarray((signs * bessel[1::2]).reshape(-1, 1))
     phi2, _ = octave.QSP_solver(coef, 1, opts, nout=2)
 
-    return list(phi1.flatten()), list(phi2.flatten())
+    return tuple(phi1.flatten()), tuple(phi2.flatten())
 
 
 def zero_controlled_cnot(qubit_list: List[int], target: int, control: Union[int, List[int]]) -> Circuit:
@@ -142,9 +194,16 @@ def zero_controlled_cnot(qubit_list: List[int], target: int, control: Union[int,
         Circuit: The zero controlled cnot circuit with possible extra controls on 1.
     """
     control_list = control if isinstance(control, list) else [control]
-    x_ladder = [Gate("X", q) for q in qubit_list]
-    gates = x_ladder + [Gate("CX", target=target, control=qubit_list+control_list)] + x_ladder
-    return Circuit(gates)
+    target_list = target if isinstance(target, list) else [target]
+    return Circuit(list(_zero_controlled_cnot_gates(tuple(qubit_list), tuple(target_list), tuple(control_list))))
+
+
+@lru_cache(maxsize=32)
+def _zero_controlled_cnot_gates(qubit_list: Tuple[int], target: Tuple[int], control: Tuple[int]) -> Tuple[Gate]:
+    """Cached gates of zero_controlled_cnot. The gates are shared, they must be copied (e.g. by creating a Circuit)
+    instead of being modified."""
+    x_ladder = tuple(Gate("X", q) for q in qubit_list)
+    return x_ladder + (Gate("CX", target=target, control=qubit_list+control),) + x_ladder
 
 
 def get_qsp_circuit_no_anc(cua: Circuit, m_qs: List[int], angles: List[float], control: Union[int, List[int]] = None, with_z: bool = False) -> Circuit:
@@ -160,31 +219,71 @@ def get_qsp_circuit_no_anc(cua: Circuit, m_qs: List[int], angles: List[float], c
     Returns:
         Circuit: The ancilla free QSP circuit
     """
-    c_list = list()
-    if control is not None:
-        c_list += control if isinstance(control, list) else [control]
+    if control is None:
+        c_list = ()
+    else:
+        c_list = tuple(control) if isinstance(control, (list, tuple)) else (control,)
 
     anc = m_qs[-1]+1
-    if with_z:
-        qubcirc = Circuit([Gate("CH", anc, control=c_list), Gate("CZ", anc, control=c_list)])
-    else:
-        qubcirc = Circuit([Gate("CH", anc, control=c_list)])
+    gates = [Gate("CH", anc, control=c_list), Gate("CZ", anc, control=c_list)] if with_z else [Gate("CH", anc, control=c_list)]
 
-    circ_angles = [angles[0]+np.pi/4]
-    for ang in angles[1:-1]:
-        circ_angles += [ang + np.pi/2]
-    circ_angles += [angles[-1]+np.pi/4]
+    # Parameters of the CRZ gates: twice the phases, shifted by pi/4 at both ends and by pi/2 in between
+    angles = np.asarray(angles, dtype=float)
+    crz_params = (2*np.concatenate(([angles[0]+_PI_4], angles[1:-1]+_PI_2, [angles[-1]+_PI_4]))).tolist()
+    crz_gates = [Gate("CRZ", target=anc, parameter=p, control=c_list) for p in crz_params]
 
-    zcnot = zero_controlled_cnot(m_qs, [anc], [])
+    # Gates repeated for each angle are built once. Gates are copied when the circuit is created, they can be shared
+    zcnot_gates = list(_zero_controlled_cnot_gates(tuple(m_qs), (anc,), ()))
+    cua_gates = cua._gates
+    cz_gate = Gate("CZ", anc, control=c_list)
 
-    qubcirc += zcnot + Circuit([Gate("CRZ", target=anc, parameter=2*circ_angles[-1], control=c_list)]) + zcnot + cua
-    for j, ang in enumerate(circ_angles[-2:0:-1]):
-        qubcirc += Circuit([Gate("CZ", anc, control=c_list)]) + zcnot + Circuit([Gate("CRZ", target=anc, parameter=2*ang, control=c_list)]) + zcnot + cua
-    qubcirc += Circuit([Gate("CZ", anc, control=c_list)]) + zcnot + Circuit([Gate("CRZ", target=anc, parameter=2*circ_angles[0], control=c_list)]) + zcnot
+    gates += zcnot_gates + [crz_gates[-1]] + zcnot_gates + cua_gates
+    for j in range(len(crz_params)-2, 0, -1):
+        gates.append(cz_gate)
+        gates.extend(zcnot_gates)
+        gates.append(crz_gates[j])
+        gates.extend(zcnot_gates)
+        gates.extend(cua_gates)
+    gates += [cz_gate] + zcnot_gates + [crz_gates[0]] + zcnot_gates
 
-    qubcirc += Circuit([Gate("CH", anc, control=c_list)])
+    gates.append(Gate("CH", anc, control=c_list))
+
+    return Circuit(gates)
 
-    return qubcirc
+
+@lru_cache(maxsize=32)
+def _get_lcu_qubit_op_info(qu_op_terms: Tuple[Tuple]) -> Tuple[Tuple[int], Tuple[int], float]:
+    """Cached get_lcu_qubit_op_info, for the (term, coefficient) items of a QubitOperator. Qubit lists are returned as
+    tuples so that they cannot be modified."""
+    qu_op = QubitOperator()
+    qu_op.terms = dict(qu_op_terms)
+    qu_op_qs, m_qs, alpha = get_lcu_qubit_op_info(qu_op)
+    return tuple(qu_op_qs), tuple(m_qs), alpha
+
+
+@lru_cache(maxsize=32)
+def _get_qsp_controlled_unitary(qu_op_terms: Tuple[Tuple], control: Tuple[int]) -> Tuple[Circuit, Tuple[int], Tuple[int]]:
+    """Return the controlled block encoding U_A = Uprep Uselect Uprep^dagger of a QubitOperator, given the (term,
+    coefficient) items of the operator and the control qubits. Results are cached: the circuit is shared and must not
+    be modified.
+
+    Returns:
+        Circuit: The controlled unitary.
+        Tuple[int]: The qubits of the operator.
+        Tuple[int]: The ancilla qubits used for the Uprep circuit.
+    """
+    qu_op = QubitOperator()
+    qu_op.terms = dict(qu_op_terms)
+    uprep, uselect, qu_op_qs, m_qs, _ = get_uprep_uselect(qu_op, control=list(control))
+    return uprep + uselect + uprep.inverse(), tuple(qu_op_qs), tuple(m_qs)
+
+
+@lru_cache(maxsize=None)
+def _get_lcu_state_prep_circuit() -> Circuit:
+    """Return the 2-qubit circuit preparing the LCU coefficients of the QSP Hamiltonian simulation circuit. These
+    coefficients do not depend on the operator, the circuit is computed once and shared: it must be copied before
+    being modified."""
+    return StateVector(_LCU_STATE_COEFFS, order="msq_first").initializing_circuit()
 
 
 def get_qsp_hamiltonian_simulation_qubit_list(qu_op: QubitOperator) -> List[int]:
@@ -194,7 +293,7 @@ def get_qsp_hamiltonian_simulation_qubit_list(qu_op: QubitOperator) -> List[int]
 
 
 def get_qsp_hamiltonian_simulation_circuit(qu_op: QubitOperator, tau: float, eps: float = 1.e-4, control: Union[int, List[int]] = None, n_attempts: int = 10,
-                                           method: str = 'laurent', folder: str = None) -> Circuit:
+                                           method: str = 'laurent', folder: str = None, max_eps: float = None) -> Circuit:
     """Returns Quantum Signal Processing (QSP) Hamiltonian simulation circuit for a given QubitOperator for time tau.
 
     The circuits are derived from https://arxiv.org/abs/2002.11649.
@@ -209,15 +308,18 @@ def get_qsp_hamiltonian_simulation_circuit(qu_op: QubitOperator, tau: float, eps
         n_attempts (int): The number of attempts to calculate the phase factors using pyqsp.
         method (str): "laurent": Use laurent polynomial method of pyqsp, "tf": Use TensorFlow with pyqsp, "QSPPACK": Use QSPPACK to calculate phases
         folder (str): Folder that contains QSPPACK.
+        max_eps (float): The largest precision the pyqsp phase factors calculation can be relaxed to after failed attempts.
+            Default, eps (no relaxation).
 
     Returns:
         Circuit: The QSP Hamiltonian simulation circuit with oblivious amplitude amplification to ensure very high success probability.
     """
 
-    if control is not None:
-        control_list = control.copy() if isinstance(control, list) else [control]
+    # Control qubits are never modified: keep them in a tuple instead of copying them
+    if control is None:
+        control_list = ()
     else:
-        control_list = []
+        control_list = tuple(control) if isinstance(control, (list, tuple)) else (control,)
 
     # If tau is negative, flip sign of tau and qu_op.
     flip_tau_sign = (tau < 0.)
@@ -225,50 +327,56 @@ def get_qsp_hamiltonian_simulation_circuit(qu_op: QubitOperator, tau: float, eps
         qu_op = -qu_op
         tau = -tau
 
-    qu_op_qs, m_qs, alpha = get_lcu_qubit_op_info(qu_op)
+    # LCU information and circuits are cached for the terms of the operator, e.g. for repeated controlled time-evolutions
+    qu_op_terms = tuple(qu_op.terms.items())
+    _, m_qs, alpha = _get_lcu_qubit_op_info(qu_op_terms)
+    m_qs = list(m_qs)
 
+    # Round the rescaled evolution time, so that phases cached for the same value are found despite floating point errors
+    tau_alpha = round(tau*alpha, 12)
     if method.lower() in ["laurent", "tf"]:
-        anglesr, anglesi = ham_sim_phases(tau*alpha, eps, n_attempts, method)
+        anglesr, anglesi = ham_sim_phases(tau_alpha, eps, n_attempts, method, max_eps)
     elif method.lower() == "qsppack":
-        anglesr, anglesi = ham_sim_phases_QSPPACK(folder, tau*alpha, eps)
+        anglesr, anglesi = ham_sim_phases_QSPPACK(folder, tau_alpha, eps)
     else:
         raise ValueError(f"{method} is not a valid keyword to calculate phases. Must be Laurent, TF, or QSPPACK")
 
-    # Want 1-norm of coefficents to sum to 1/np.sin(np.pi/(2*(2*3+1))) so three oblivious amplitude amplifications results
-    # in success probability of 1. |(cos(Ht)|=2 and |iSin(Ht))|=2 so need to add (tsum-4)/2 I - (tsum-4)/2 I.
-    tsum = 1/np.sin(np.pi/(2*(2*3+1)))
-    v = [(tsum-4)/2, (tsum-4)/2, 2, 2]
-    v = np.sqrt(np.array(v))/np.sqrt(tsum)
-
     # Leave gap of 1-qubit for qsp_circuit and list LCU qubits to add cos(Ht) + Sin(Ht) + (tsum-4)/2 I - (tsum-4)/2 I
     lcu_qs = list(range(m_qs[-1]+2, m_qs[-1]+4))
     flip_qs = m_qs + [m_qs[-1]+1] + lcu_qs
+    lcu_control = tuple(lcu_qs) + control_list
 
-    uprep, uselect, qu_op_qs, m_qs, alpha = get_uprep_uselect(qu_op, control=lcu_qs+control_list)
-    cua = uprep + uselect + uprep.inverse()
+    cua, qu_op_qs, m_qs = _get_qsp_controlled_unitary(qu_op_terms, lcu_control)
+    m_qs = list(m_qs)
 
-    s = StateVector(v, order="msq_first")
-    uprep = s.initializing_circuit()
+    # The state preparation circuit is cached: copy it before reindexing its qubits
+    uprep = _get_lcu_state_prep_circuit().copy()
     uprep.reindex_qubits([lcu_qs[0], lcu_qs[1]])
+    uprep_inv = uprep.inverse()
 
-    circ = uprep + Circuit([Gate("X", lcu_qs[0])])
+    # The gates are accumulated in a single list, instead of adding intermediate circuits
+    circ_gates = uprep._gates + [Gate("X", lcu_qs[0])]
     # real part cos(Ht)
-    circ += get_qsp_circuit_no_anc(cua, m_qs, anglesr, control=lcu_qs+control_list, with_z=False)
-    circ += Circuit([Gate("X", lcu_qs[0])])
+    circ_gates += get_qsp_circuit_no_anc(cua, m_qs, anglesr, control=lcu_control, with_z=False)._gates
+    circ_gates.append(Gate("X", lcu_qs[0]))
     # imaginary part i*sin(Ht)
-    circ += get_qsp_circuit_no_anc(cua, m_qs, anglesi, control=lcu_qs+control_list, with_z=False)
+    circ_gates += get_qsp_circuit_no_anc(cua, m_qs, anglesi, control=lcu_control, with_z=False)._gates
     # -I to ensure probability is np.arcsin
-    circ += Circuit([Gate("X", lcu_qs[1]), Gate("CRZ", target=0, parameter=2*np.pi, control=lcu_qs+control_list), Gate("X", lcu_qs[1])])
-
-    circ += uprep.inverse()
+    circ_gates += [Gate("X", lcu_qs[1]), Gate("CRZ", target=0, parameter=_TWO_PI, control=lcu_control), Gate("X", lcu_qs[1])]
+    circ_gates += uprep_inv._gates
 
     if control is not None:
-        gates = [Gate("CRZ", qu_op_qs[0], control=control, parameter=2*np.pi)] if len(anglesi) % 4 == 2 else []
+        gates = [Gate("CRZ", qu_op_qs[0], control=control, parameter=_TWO_PI)] if len(anglesi) % 4 == 2 else []
     else:
-        gates = [Gate("RZ", qu_op_qs[0], parameter=2*np.pi)] if len(anglesi) % 4 == 2 else []
+        gates = [Gate("RZ", qu_op_qs[0], parameter=_TWO_PI)] if len(anglesi) % 4 == 2 else []
 
     if flip_tau_sign:
         qu_op = -qu_op
         tau = -tau
 
-    return circ + (sign_flip(flip_qs) + circ.inverse() + sign_flip(flip_qs) + circ)*3 + Circuit(gates)
+    # Three rounds of oblivious amplitude amplification. The gate lists are only assembled and copied once
+    circ_inv_gates = [gate.inverse() for gate in reversed(circ_gates)]
+    sign_flip_gates = sign_flip(flip_qs)._gates
+    amplification_gates = sign_flip_gates + circ_inv_gates + sign_flip_gates + circ_gates
+
+    return Circuit(circ_gates + amplification_gates*3 + gates)
@@ -13,6 +13,8 @@
 # limitations under the License.
 
 import unittest
+import warnings
+from unittest.mock import patch
 
 import numpy as np
 from scipy.linalg import expm
@@ -26,7 +28,8 @@ from tangelo.toolboxes.qubit_mappings.mapping_transform import fermion_to_qubit_
 from tangelo.toolboxes.ansatz_generator.ansatz_utils import get_qft_circuit
 from tangelo.molecule_library import mol_H2_sto3g
 from tangelo.toolboxes.circuits.lcu import get_lcu_qubit_op_info
-from tangelo.toolboxes.circuits.qsp import get_qsp_hamiltonian_simulation_circuit, get_qsp_hamiltonian_simulation_qubit_list
+from tangelo.toolboxes.circuits.qsp import (get_qsp_hamiltonian_simulation_circuit, get_qsp_hamiltonian_simulation_qubit_list,
+                                            ham_sim_phases, _ham_sim_phases)
 
 # Test for both "cirq" and if available "qulacs". These have different orderings.
 # qiskit is not currently supported because does not have multi controlled general gates.
@@ -106,6 +109,64 @@ class QSPTest(unittest.TestCase):
         # State 9 has eigenvalue 0.25 so return should be 010 (0*1/2 + 1*1/4 + 0*1/8)
         self.assertAlmostEqual(trace_freq["010"], 1.0, delta=1.e-4)
 
+    def test_ham_sim_phases_cached(self):
+        """Verify that phases are only computed once for the same arguments, by checking that the second call is a cache
+        hit, and that modifying the lists returned does not affect the cached phases.
+        """
+
+        anglesr, anglesi = ham_sim_phases(0.7, 1.e-2)
+        anglesr_ref, anglesi_ref = anglesr.copy(), anglesi.copy()
+        anglesr[0] += 1.
+
+        cache_info = _ham_sim_phases.cache_info()
+        anglesr2, anglesi2 = ham_sim_phases(0.7, 1.e-2)
+        self.assertEqual(_ham_sim_phases.cache_info().hits, cache_info.hits + 1)
+        self.assertEqual(_ham_sim_phases.cache_info().misses, cache_info.misses)
+        self.assertEqual(anglesr2, anglesr_ref)
+        self.assertEqual(anglesi2, anglesi_ref)
+
+    def test_qsp_circuit_phases_cached_for_rounded_evolution_time(self):
+        """Verify that evolution times only differing by floating point errors reuse the cached phases."""
+
+        qu_op = QubitOperator("X0 X1", 0.25) + QubitOperator("Z0", 0.25)
+        self.assertNotEqual(0.3, 0.1 + 0.2)
+
+        circuit = get_qsp_hamiltonian_simulation_circuit(qu_op, 0.3, eps=1.e-2)
+        cache_info = _ham_sim_phases.cache_info()
+        circuit2 = get_qsp_hamiltonian_simulation_circuit(qu_op, 0.1 + 0.2, eps=1.e-2)
+        self.assertEqual(_ham_sim_phases.cache_info().hits, cache_info.hits + 1)
+        self.assertEqual(_ham_sim_phases.cache_info().misses, cache_info.misses)
+        self.assertEqual(circuit, circuit2)
+
+    def test_ham_sim_phases_eps_relaxation(self):
+        """Verify that the precision of the phase factors calculation is relaxed by a factor 1.5 after each failed attempt,
+        up to max_eps, with a warning, and that it is not relaxed by default.
+        """
+        from pyqsp.angle_sequence import AngleFindingError
+
+        eps_attempts = []
+
+        def failing_solver(pcoefs, eps, suc, method):
+            eps_attempts.append(eps)
+            raise AngleFindingError
+
+        with patch("pyqsp.angle_sequence.QuantumSignalProcessingPhases", side_effect=failing_solver):
+            with self.assertWarns(RuntimeWarning):
+                with self.assertRaises(RuntimeError):
+                    ham_sim_phases(0.37, 1.e-2, n_attempts=5, max_eps=3.e-2)
+            np.testing.assert_allclose(eps_attempts, [1.e-2, 1.5e-2, 2.25e-2, 3.e-2, 3.e-2])
+
+            eps_attempts.clear()
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                with self.assertRaises(RuntimeError):
+                    ham_sim_phases(0.37, 1.e-2, n_attempts=3)
+            self.assertEqual(eps_attempts, [1.e-2]*3)
+            self.assertFalse([w for w in caught if issubclass(w.category, RuntimeWarning)])
+
+        with self.assertRaises(ValueError):
+            ham_sim_phases(0.37, 1.e-2, max_eps=1.e-3)
+
 
 if __name__ == "__main__":
     unittest.main()
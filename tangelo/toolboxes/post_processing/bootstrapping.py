@@ -13,8 +13,6 @@
 # limitations under the License.
 
 import numpy as np
-from scipy import stats
-from collections import Counter
 
 
 def get_resampled_frequencies(freq_dict, ncount):
@@ -30,29 +28,11 @@ def get_resampled_frequencies(freq_dict, ncount):
         dict: new frequencies dictionary with resampled distribution.
     """
 
-    length_dict = len(freq_dict.keys())
-    xk = np.empty(length_dict, dtype=np.int64)
-    pk = np.empty(length_dict, dtype=float)
-
-    # Convert to arrays of integers and frequencies and create generator for samples
-    for i, (k, v) in enumerate(freq_dict.items()):
-        xk[i] = int(k, 2)
-        pk[i] = v
-    distr = stats.rv_discrete(name="distr", values=(xk, pk))
-
-    # Obtain output bitstring string format
-    n_qubits = len(list(freq_dict.keys())[0])
-    format_specifier = "0"+str(n_qubits)+"b"
-
-    # Generate samples from distribution. Cut in chunks to ensure samples fit in memory, gradually accumulate
-    chunk_size = 10**7
-    n_chunks = ncount // chunk_size
-    freqs_shots = Counter()
-
-    for i in range(n_chunks+1):
-        this_chunk = ncount % chunk_size if i == n_chunks else chunk_size
-        samples = distr.rvs(size=this_chunk)
-        freqs_shots += Counter(samples)
-    frequencies = {format(k, format_specifier): v / ncount for k, v in freqs_shots.items()}
+    xk = list(freq_dict.keys())
+    pk = np.fromiter(freq_dict.values(), dtype=float, count=len(xk))
+
+    # Draw the number of occurrences of each bitstring in ncount samples at once
+    counts = np.random.multinomial(ncount, pk / pk.sum())
+    frequencies = {xk[k]: counts[k] / ncount for k in np.nonzero(counts)[0]}
 
     return frequencies
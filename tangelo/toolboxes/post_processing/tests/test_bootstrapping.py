@@ -0,0 +1,50 @@
+# Copyright 2023 Good Chemistry Company.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+
+from tangelo.toolboxes.post_processing.bootstrapping import get_resampled_frequencies
+
+
+class BootstrappingTest(unittest.TestCase):
+
+    def test_get_resampled_frequencies(self):
+        """Test that resampled frequencies are a distribution over the input
+        bitstrings, and that they are reproducible for a given seed.
+        """
+
+        freq_dict = {"000": 0.5, "011": 0.25, "101": 0.15, "110": 0.1}
+
+        np.random.seed(7)
+        resampled = get_resampled_frequencies(freq_dict, 1000)
+
+        self.assertTrue(set(resampled).issubset(freq_dict))
+        self.assertAlmostEqual(sum(resampled.values()), 1.)
+        for v in resampled.values():
+            self.assertAlmostEqual(v * 1000, round(v * 1000))
+
+        np.random.seed(7)
+        self.assertEqual(get_resampled_frequencies(freq_dict, 1000), resampled)
+
+    def test_get_resampled_frequencies_drops_unsampled(self):
+        """Test that bitstrings with zero probability are not returned."""
+
+        resampled = get_resampled_frequencies({"00": 1., "11": 0.}, 100)
+        self.assertEqual(resampled, {"00": 1.})
+
+
+if __name__ == "__main__":
+    unittest.main()